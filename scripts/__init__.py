@@ -1,3 +1,3 @@
-from . import models, tools
+from . import models, tools, utils
 from .run import cli
 from .config import Config
\ No newline at end of file
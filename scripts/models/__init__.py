@@ -1 +1,2 @@
-from .attrItem import AttrItem
\ No newline at end of file
+from .attrItem import AttrItem
+from .sitemapEntry import SitemapEntry
\ No newline at end of file
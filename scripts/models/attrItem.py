@@ -4,21 +4,33 @@ Attributions Item Model
 Data model representing a Attributions item.
 """
 # MARK: Imports
-from dataclasses import dataclass
+import operator
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterable
 
 # MARK: Classes
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AttrItem:
     """
     Data model representing an attributions item.
     """
+    # Constants
+    _DICT_KEYS = ("category", "title", "link", "filePath")
+
     # Properties
     category: str
     title: str
     link: str
     filePath: Path
 
+    _filePathStr: str = field(init=False, repr=False, compare=False)
+
+    # Python Functions
+    def __post_init__(self):
+        # Cache the string form of the path
+        object.__setattr__(self, "_filePathStr", str(self.filePath))
+
     # Functions
     def toDict(self) -> dict[str, str]:
         """
@@ -31,5 +43,18 @@ class AttrItem:
             "category": self.category,
             "title": self.title,
             "link": self.link,
-            "filePath": str(self.filePath)
+            "filePath": self._filePathStr
         }
+
+    @classmethod
+    def manyToDicts(cls, items: Iterable["AttrItem"]) -> list[dict[str, str]]:
+        """
+        Converts many AttrItems to dictionaries at once.
+
+        items: The AttrItems to convert.
+
+        Returns:
+            A list of dictionary representations of the AttrItems in the same order as `items`.
+        """
+        getValues = operator.attrgetter("category", "title", "link", "_filePathStr")
+        return [dict(zip(cls._DICT_KEYS, values)) for values in map(getValues, items)]
\ No newline at end of file
@@ -0,0 +1,21 @@
+"""
+Sitemap Entry Model
+
+Data model representing a single URL entry in the sitemap.
+"""
+# MARK: Imports
+from dataclasses import dataclass
+from typing import Optional
+
+# MARK: Classes
+@dataclass(slots=True, frozen=True)
+class SitemapEntry:
+    """
+    Data model representing a single URL entry in the sitemap.
+    Optional values that are `None` are left out of the sitemap.
+    """
+    # Properties
+    loc: str
+    lastmod: Optional[str] = None
+    changefreq: Optional[str] = None
+    priority: Optional[float] = None
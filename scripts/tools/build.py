@@ -4,24 +4,189 @@ Build Tool
 Builds the static site by rendering templates with content.
 """
 # MARK: Imports
+import os
+import re
+import gc
 import time
-import json
+import uuid
+import threading
+import hashlib
 import shutil
-import webbrowser
-import datetime
+import fnmatch
 import argparse
-from typing import Optional, Any
+import functools
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Union, Any, Iterator
 from pathlib import Path
-from shutil import copy2
 
-import jinja2
-import minify_html
-from tqdm import tqdm
-
-from .sync import SyncTool
 from .baseTool import BaseTool
 from ..config import Config
-from ..models import AttrItem
+from ..models import AttrItem, SitemapEntry
+from ..utils import fastCopy, writeBytes
+
+# NOTE: Heavier modules are imported where they are used so other tools start faster.
+if TYPE_CHECKING:
+    import jinja2
+
+# MARK: Constants
+PARALLEL_RENDER_THRESHOLD = 512 # Minimum number of pages before rendering is spread across processes; a page renders in about 1 ms while starting the worker processes costs a few hundred
+BUILD_STATE_FILE_NAME = "buildState.json" # Name of the file in the cache directory that records the last build for incremental builds
+
+# Options used for every minified page
+MINIFY_KWARGS: dict[str, bool] = {
+    "keep_closing_tags": True,
+    "minify_css": True,
+    "minify_js": True,
+    "remove_processing_instructions": True
+}
+
+# Render worker process state set by `_initRenderWorker`
+_workerJinjaEnv: Optional["jinja2.Environment"] = None
+_workerBasePayload: dict[str, Any] = {}
+
+# MARK: - JSON Functions
+def _loadJson(data: bytes) -> Any:
+    """
+    Parses the JSON `data` using `orjson` if it is installed or `json` otherwise.
+
+    data: The JSON encoded bytes to parse.
+
+    Returns the parsed object.
+    """
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.loads(data)
+
+    return orjson.loads(data)
+
+def _dumpJsonIndented(obj: Any) -> bytes:
+    """
+    Serializes the `obj` to JSON indented by two spaces using `orjson` if it is installed or `json` otherwise.
+
+    obj: The object to serialize.
+
+    Returns the JSON encoded bytes.
+    """
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.dumps(obj, indent=2).encode("utf-8")
+
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+# MARK: - Rendering Functions
+def _createJinjaEnv(searchPaths: tuple[str, ...], templateCacheDir: Optional[str]) -> "jinja2.Environment":
+    """
+    Creates a Jinja2 environment for template rendering.
+
+    searchPaths: The directories to load templates from in order of priority.
+    templateCacheDir: The directory to cache compiled templates in or `None` to disable the cache.
+
+    Returns a Jinja2 environment.
+    """
+    import jinja2
+
+    # Prepare the compiled template cache
+    bytecodeCache: Optional[jinja2.BytecodeCache] = None
+    if templateCacheDir is not None:
+        bytecodeCache = jinja2.FileSystemBytecodeCache(templateCacheDir)
+
+    # Load the template environment
+    # NOTE: Templates do not change during a build so reload checks and cache eviction are disabled. The environment can outlive a build so `BuildTool.build()` clears its loaded templates to pick up edits made between builds.
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(searchPaths),
+        autoescape=False,
+        auto_reload=False,
+        cache_size=-1,
+        bytecode_cache=bytecodeCache
+    )
+
+@functools.lru_cache(maxsize=None)
+def _getSharedJinjaEnv(searchPaths: tuple[str, ...], templateCacheDir: Optional[str]) -> "jinja2.Environment":
+    """
+    Returns the Jinja2 environment shared by everything in this process that uses the same settings, creating it on first use.
+    Sharing the environment means each template is only compiled once per process.
+
+    searchPaths: The directories to load templates from in order of priority.
+    templateCacheDir: The directory to cache compiled templates in or `None` to disable the cache.
+    """
+    return _createJinjaEnv(searchPaths, templateCacheDir)
+
+def _writeMinified(outputPath: str, html: str, lastHash: Optional[str]) -> str:
+    """
+    Minifies the rendered `html` and writes it to the `outputPath`.
+    Both are skipped when the `html` matches the `lastHash` and the output exists. The output is then only touched so incremental builds see it as up to date with its templates.
+
+    outputPath: The path to write the minified HTML to.
+    html: The rendered HTML.
+    lastHash: The hash of the HTML last written to the `outputPath` or `None` if unknown.
+
+    Returns the hash of the `html` to provide as the `lastHash` next time.
+    """
+    # Check if the page is unchanged
+    # NOTE: The encoded HTML is only kept for hashing so it is not alive alongside the minified copy.
+    htmlHash = hashlib.blake2b(html.encode("utf-8"), digest_size=16).hexdigest()
+    if htmlHash == lastHash:
+        # Mark the output as current
+        try:
+            os.utime(outputPath)
+            return htmlHash
+        except FileNotFoundError:
+            pass
+
+    import minify_html
+
+    # Write the minified HTML
+    # NOTE: Written as encoded bytes straight to the file descriptor since the whole page is already in memory.
+    writeBytes(outputPath, minify_html.minify(html, **MINIFY_KWARGS).encode("utf-8"))
+
+    return htmlHash
+
+def _renderPage(env: "jinja2.Environment", templateName: str, basePayload: dict[str, Any], pagePath: str, outputPath: str, lastHash: Optional[str]) -> str:
+    """
+    Renders a single page template, minifies it, and writes it to the output.
+
+    env: The Jinja2 environment containing the templates.
+    templateName: The name of the template to render as known to the `env`.
+    basePayload: The context shared by every page to render the template with.
+    pagePath: The `pagePath` value to add to the context for this page.
+    outputPath: The path to write the rendered page to.
+    lastHash: The hash of the page from the last build or `None` if unknown.
+
+    Returns the hash of the rendered page.
+    """
+    # Render the template with the content file
+    html = env.get_template(templateName).render(basePayload, pagePath=pagePath)
+
+    # Write the rendered HTML to the output directory
+    return _writeMinified(outputPath, html, lastHash)
+
+def _initRenderWorker(searchPaths: tuple[str, ...], templateCacheDir: Optional[str], basePayload: dict[str, Any]):
+    """
+    Prepares a render worker process once when it starts so the rendering jobs only need to carry their per-page values.
+
+    searchPaths: The directories to load templates from in order of priority.
+    templateCacheDir: The directory to cache compiled templates in or `None` to disable the cache.
+    basePayload: The context shared by every page.
+    """
+    global _workerJinjaEnv, _workerBasePayload
+    _workerJinjaEnv = _getSharedJinjaEnv(searchPaths, templateCacheDir)
+    _workerBasePayload = basePayload
+
+def _renderPageWorker(job: tuple[str, str, str, Optional[str]]) -> str:
+    """
+    Renders a single page from within a render worker process prepared by `_initRenderWorker`.
+
+    job: A tuple of the template name, page path, output path, and hash of the page from the last build.
+
+    Returns the hash of the rendered page.
+    """
+    templateName, pagePath, outputPath, lastHash = job
+    return _renderPage(_workerJinjaEnv, templateName, _workerBasePayload, pagePath, outputPath, lastHash)
 
 # MARK: - BuildTool
 class BuildTool(BaseTool):
@@ -44,7 +209,11 @@ class BuildTool(BaseTool):
         copyBlacklist: tuple[str, ...] = tuple(),
         socialLinks: dict[str, str] = {},
         overrides: dict[str, Any] = {},
-        staticSync: bool = False
+        staticSync: bool = False,
+        syncPollInterval: float = 5.0,
+        cacheDir: Optional[Path] = None,
+        templateCache: bool = True,
+        incremental: bool = False
     ):
         """
         name: The name of the website as a whole like `"My Blog"`.
@@ -54,10 +223,14 @@ class BuildTool(BaseTool):
         templateDir: The directory containing the template files.
         outputDir: The directory to output the built site to.
         attributions: A list of `AttrItem` objects to include in the attributions page.
-        copyBlacklist: A tuple of file or directory names to exclude from copying.
+        copyBlacklist: A tuple of file or directory names to exclude from copying. Names containing the `*` or `?` glob wildcards like `"*.tmp"` are matched as patterns while other names, including ones with brackets like `"[draft]"`, must match exactly.
         socialLinks: A dictionary of social media links to include in the site like `{"substack": "https://mbmcloude.substack.com"}`.
         overrides: A dictionary of additional or override `key:value` pairs to include in the template rendering context. These will override any other values with the same key.
         staticSync: Whether to watch for changes in the build output's static files' content and write them back to the source directory automatically. Changes made in the source directory will still require a rebuild to be reflected in the output.
+        syncPollInterval: The interval in seconds to poll for changes when `staticSync` is enabled and the `outputDir` is on a network file system.
+        cacheDir: The directory to store build caches in between builds. Provide `None` to use `.buildcache/` next to the `outputDir`.
+        templateCache: Whether to cache compiled templates in the `cacheDir` so unchanged templates are not recompiled on following builds.
+        incremental: Whether to only render pages and copy files that changed since the last build. Output files whose source has been removed are not deleted in this mode.
         """
         # Setup
         super().__init__()
@@ -70,10 +243,31 @@ class BuildTool(BaseTool):
         self.templateDir = templateDir.absolute()
         self.outputDir = outputDir.absolute()
         self.attributions = attributions
-        self.copyBlacklist = copyBlacklist
+        self.copyBlacklist = frozenset(copyBlacklist)
         self.socialLinks = socialLinks
         self.overrides = overrides
         self.doStaticSync = staticSync
+        self.syncPollInterval = syncPollInterval
+        self.cacheDir = (Path(cacheDir) if cacheDir else (self.outputDir.parent / ".buildcache")).absolute()
+        self.doTemplateCache = templateCache
+        self.doIncremental = incremental
+
+        # Cache path strings for hot paths
+        self._sourceDirStr = str(self.sourceDir)
+        self._templateDirStr = str(self.templateDir)
+        self._outputDirStr = str(self.outputDir)
+        self._sourceDirLen = len(self._sourceDirStr) + 1 # Length of the prefix to slice off for paths within the source directory
+        self._outputDirLen = len(self._outputDirStr) + 1 # Length of the prefix to slice off for paths within the output directory
+
+        self._jinjaEnv: Optional["jinja2.Environment"] = None
+        self._cleanupThreads: list[threading.Thread] = []
+        self._cacheVersion: Optional[str] = None
+        self._buildState: dict[str, Any] = {}
+
+        # Compile the blacklist's glob patterns into a single expression
+        # NOTE: Only `*` and `?` mark a pattern so existing names containing brackets keep matching literally.
+        blacklistPatterns = [fnmatch.translate(name) for name in self.copyBlacklist if any((c in name) for c in "*?")]
+        self._copyBlacklistPattern: Optional[re.Pattern] = (re.compile("|".join(blacklistPatterns)) if blacklistPatterns else None)
 
         # Make output directory
         self.outputDir.mkdir(parents=True, exist_ok=True)
@@ -100,6 +294,22 @@ class BuildTool(BaseTool):
             action="store_true",
             help=f"Watch for changes in the the build output's (`{Path(config.get('build', 'outputDirectory')).name}/`) static files' content and writes them back to the source directory (`{Path(config.get('build', 'sourceDirectory')).name}/`) automatically. Changes made in the source directory will still require a rebuild to be reflected in the output."
         )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="The interval in seconds to poll for changes when syncing and the output directory is on a network file system. (default: %(default)s)"
+        )
+        parser.add_argument(
+            "--no-template-cache",
+            action="store_true",
+            help="Compile all templates from scratch instead of reusing the compiled templates cached by previous builds."
+        )
+        parser.add_argument(
+            "-i", "--incremental",
+            action="store_true",
+            help="Only render pages and copy files that changed since the last build instead of rebuilding the output from scratch. Output files whose source has been removed are not deleted."
+        )
 
     @classmethod
     def fromArgs(cls, args: argparse.Namespace, config: Optional[Config]) -> "BuildTool":
@@ -149,7 +359,11 @@ class BuildTool(BaseTool):
             copyBlacklist=tuple(config.get("build", "blacklist")),
             socialLinks=config.getDict((str, ), "socialMedia", fallback={}),
             overrides=config.getDict(None, "overrides", fallback={}),
-            staticSync=args.sync
+            staticSync=args.sync,
+            syncPollInterval=args.poll_interval,
+            cacheDir=config.get("build", "cacheDirectory", fallback=None),
+            templateCache=(not args.no_template_cache),
+            incremental=args.incremental
         )
 
     def _run(self, args: argparse.Namespace, config: Optional[Config]):
@@ -159,23 +373,55 @@ class BuildTool(BaseTool):
         args: The parser arguments to create the tool from.
         config: The config manager to use for the tool.
         """
-        self.clean()
+        if not self.doIncremental:
+            self.clean()
+
         self.build()
+        self.waitForClean()
 
         if args.open:
+            import webbrowser
             webbrowser.open(str(self.outputDir / "index.html"))
 
     # MARK: Functions
     def clean(self):
         """
         Cleans the output directory by deleting its content.
+        The previous output is moved into the cache directory and deleted in the background so the build is not blocked by it.
+        Call `waitForClean()` to wait for the deletion to finish.
         """
-        # Delete the output directory if it exists
-        shutil.rmtree(self.outputDir)
+        # Check if there is anything to clean
+        if self.outputDir.exists():
+            # Move the previous output out of the way
+            self.cacheDir.mkdir(parents=True, exist_ok=True)
+            oldOutputDir = self.cacheDir / f"old-output-{uuid.uuid4().hex}"
+            try:
+                self.outputDir.rename(oldOutputDir)
+            except OSError:
+                # Delete in place when it cannot be moved like when the cache directory is on another filesystem
+                shutil.rmtree(self.outputDir)
+            else:
+                # Delete the previous output in the background
+                cleanupThread = threading.Thread(
+                    target=shutil.rmtree,
+                    args=(oldOutputDir, ),
+                    kwargs={"ignore_errors": True}
+                )
+                cleanupThread.start()
+                self._cleanupThreads.append(cleanupThread)
 
         # Recreate the output directory
         self.outputDir.mkdir(parents=True, exist_ok=True)
 
+    def waitForClean(self):
+        """
+        Waits for any background deletions started by `clean()` to finish.
+        """
+        for cleanupThread in self._cleanupThreads:
+            cleanupThread.join()
+
+        self._cleanupThreads.clear()
+
     def build(self):
         """
         Builds the static site by rendering templates with content.
@@ -183,20 +429,45 @@ class BuildTool(BaseTool):
         # Prepare the Jinja2 environment
         env = self._prepJinjaEnv()
 
-        # Process all files
-        self._processFiles(env)
+        # Drop the templates loaded by previous builds in this process since they may have been edited since
+        # NOTE: Unchanged templates are quickly reloaded from the compiled template cache when enabled.
+        env.cache.clear()
 
-        # Report
-        print("Files processed.")
+        # Set the cache busting version shared by every file in this build
+        import datetime
+        self._cacheVersion = datetime.datetime.now(datetime.timezone.utc).strftime("%y%m%d%H%M%S")
+
+        # Hide the long-lived objects created so far like imported modules and the environment from the garbage collector
+        # NOTE: Rendering allocates many short-lived objects so collections during it are cheaper when they skip everything else.
+        gc.freeze()
+        try:
+            # Load the record of the last build
+            self._buildState = self._loadBuildState()
 
-        # Update the site.webmanifest
-        self._updateSiteWebManifest()
+            # Forget the page hashes when the output was cleaned since they no longer describe it
+            if not self.doIncremental:
+                self._buildState.pop("pageHashes", None)
 
-        # Build the attributions page
-        self._buildAttributionsPage(env)
+            # Process all files
+            self._processFiles(env)
 
-        # Generate sitemap.xml
-        self._buildSitemap(env)
+            # Report
+            print("Files processed.")
+
+            # Update the site.webmanifest
+            self._updateSiteWebManifest()
+
+            # Build the attributions page
+            self._buildAttributionsPage(env)
+
+            # Generate sitemap.xml
+            self._buildSitemap(env)
+
+            # Record this build
+            self._saveBuildState()
+        finally:
+            # Return the objects to the garbage collector
+            gc.unfreeze()
 
         # Report
         print(f"Built to: {self.outputDir}")
@@ -207,146 +478,508 @@ class BuildTool(BaseTool):
             self._startStaticFileSyncWatcher()
 
     # MARK: Internal Functions
-    def _prepJinjaEnv(self) -> jinja2.Environment:
+    def _prepJinjaEnv(self) -> "jinja2.Environment":
         """
         Prepares and returns a Jinja2 environment for template rendering.
+        The environment is shared with any other `BuildTool` in this process using the same directories so compiled templates are shared between pages and builds.
 
         Returns a Jinja2 environment.
         """
+        # Check if already prepared
+        if self._jinjaEnv is not None:
+            return self._jinjaEnv
+
+        # Prepare the compiled template cache
+        templateCacheDir = self._getTemplateCacheDir()
+        if templateCacheDir is not None:
+            Path(templateCacheDir).mkdir(parents=True, exist_ok=True)
+
         # Load the template environment
-        env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader((
-                str(self.templateDir),
-                str(self.sourceDir)
-            )),
-            autoescape=False
-        )
+        self._jinjaEnv = _getSharedJinjaEnv(self._getTemplateSearchPaths(), templateCacheDir)
 
         # Report
         print("Templates registered.")
 
-        return env
+        return self._jinjaEnv
 
-    def _getStandardJinjaPayload(self, contentFile: Path, relPath: Optional[Path] = None) -> dict[str, Any]:
+    def _getTemplateSearchPaths(self) -> tuple[str, ...]:
+        """
+        Returns the directories templates are loaded from in order of priority.
+        """
+        return (self._templateDirStr, self._sourceDirStr)
+
+    def _getTemplateCacheDir(self) -> Optional[str]:
+        """
+        Returns the directory compiled templates are cached in or `None` if the template cache is disabled.
+        """
+        if not self.doTemplateCache:
+            return None
+
+        return str(self.cacheDir / "templates")
+
+    def _getStandardJinjaPayload(self, contentFile: Optional[Path], relPath: Optional[Union[str, Path]] = None) -> dict[str, Any]:
         """
         Returns a standard payload dictionary for Jinja2 template rendering.
 
-        contentFile: The content file being rendered.
-        relPath: The relative path from the output directory to the content file. Provide `None` to attempt to auto-resolve.
+        contentFile: The content file being rendered. Only used when `relPath` is `None`.
+        relPath: The relative path from the output directory to the content file. A `str` is used as is so it must already be POSIX style. Provide `None` to attempt to auto-resolve.
         """
         # Resolve page path
         pagePath = relPath
         if pagePath is None:
             pagePath = contentFile.relative_to(self.sourceDir)
-        pagePath = Path(pagePath)
+        if not isinstance(pagePath, str):
+            pagePath = Path(pagePath).as_posix()
 
         # Build it
+        payload = self._getBaseJinjaPayload()
+        payload["pagePath"] = self._getPagePath(pagePath)
+
+        return payload
+
+    def _getBaseJinjaPayload(self) -> dict[str, Any]:
+        """
+        Returns the payload dictionary values shared by every template rendered in this build.
+        """
         return {
             **self.socialLinks,
             "rootUrl": self.rootUrl,
-            "pagePath": str(pagePath.as_posix()),
-            "cacheVersion": datetime.datetime.now(datetime.timezone.utc).strftime("%y%m%d%H%M%S"),
+            "cacheVersion": self._cacheVersion,
             **self.overrides # Overrides last to take precedence
         }
 
-    def _processFiles(self, env: jinja2.Environment, root: Optional[Path] = None):
+    def _getPagePath(self, relPath: str) -> str:
+        """
+        Returns the `pagePath` payload value for the page at `relPath` taking any override into account.
+
+        relPath: The POSIX style relative path from the output directory to the page.
+        """
+        return self.overrides.get("pagePath", relPath)
+
+    def _processFiles(self, env: "jinja2.Environment"):
         """
         Processes all files in the input directory as appropriate for their file type.
+        Regular files are copied across threads while the input directory is still being walked.
 
         env: The Jinja2 environment containing the templates.
-        root: The root directory to start searching for HTML files within. Provide `None` to use the source directory.
         """
-        # Determine the roots
-        if root is None:
-            rootInput = self.sourceDir
-        else:
-            rootInput = root.absolute()
+        from tqdm import tqdm
 
-        rootOutput = (self.outputDir / rootInput.relative_to(self.sourceDir)).absolute()
+        # Walk the input directory
+        pages: list[tuple[str, str]] = []
+        copies: list[Future] = []
+        with tqdm(desc="Copying files", unit="file") as progress, ThreadPoolExecutor() as executor:
+            for isPage, inputPath, relPath, outputPath in self._walkFiles():
+                if isPage:
+                    # Render once the walk is complete
+                    pages.append((relPath, outputPath))
+                else:
+                    # Copy the regular file
+                    copy = executor.submit(self._copyFile, inputPath, outputPath)
+                    copy.add_done_callback(lambda _: progress.update())
+                    copies.append(copy)
+
+            # Set the now known total
+            progress.total = len(copies)
+            progress.refresh()
+
+        # Check if any file was copied while raising any copy errors
+        copiedAny = False
+        for copy in copies:
+            copiedAny = copy.result() or copiedAny
+
+        # Skip the unchanged pages
+        if self.doIncremental:
+            pages = self._getChangedPages(env, pages, copiedAny)
+
+        # Render the HTML files
+        self._renderPages(env, pages)
+
+    def _copyFile(self, inputPath: str, outputPath: str) -> bool:
+        """
+        Copies a regular file to the output directory.
+        When building incrementally, files with an output newer than their input are skipped.
 
-        # Create the output root, if needed
-        rootOutput.mkdir(parents=True, exist_ok=True)
+        inputPath: The path of the file to copy.
+        outputPath: The path to copy the file to.
 
-        # Walk the input directory
-        for item in tqdm(
-            tuple(rootInput.iterdir()),
-            desc=str(rootInput.relative_to(self.sourceDir.parent)),
-            unit="item"
-        ):
-            # Determine paths
-            inputPath = item.absolute()
-            outputPath = (rootOutput / item.name).absolute()
-
-            # Decide the action
-            if inputPath.name in self.copyBlacklist:
-                # Skip blacklisted items
-                continue
-            elif inputPath.is_dir():
-                # Recurse into directory
-                self._processFiles(env, root=inputPath)
+        Returns `True` if the file was copied.
+        """
+        # Check if the output is already up to date
+        if self.doIncremental:
+            try:
+                if os.stat(outputPath).st_mtime_ns >= os.stat(inputPath).st_mtime_ns:
+                    return False
+            except FileNotFoundError:
+                pass
+
+        # Copy the file
+        # NOTE: Only file content is copied since the output does not need the source files' metadata.
+        fastCopy(inputPath, outputPath)
+        return True
+
+    def _getChangedPages(self, env: "jinja2.Environment", pages: list[tuple[str, str]], copiedAny: bool) -> list[tuple[str, str]]:
+        """
+        Filters the `pages` down to those that need to be rendered again since the last build.
+        A page is rendered again when its output is missing or older than its template or any template it references.
+        Every page is rendered again when the site configuration changed or a regular file was copied since their cache busting version must change.
+
+        env: The Jinja2 environment containing the templates.
+        pages: A list of `(relPath, outputPath)` tuples to filter.
+        copiedAny: Whether any regular file was copied during this build.
+
+        Returns the filtered list of `(relPath, outputPath)` tuples.
+        """
+        # Check if every page must be rendered
+        lastState = self._buildState
+        if copiedAny or (lastState.get("cacheVersion") is None) or (lastState.get("configHash") != self._getConfigHash()):
+            return pages
+
+        # Keep the last cache busting version so unchanged pages stay valid
+        self._cacheVersion = lastState["cacheVersion"]
+
+        # Check each page
+        resolvedMTimes: dict[str, Optional[int]] = {}
+        changedPages: list[tuple[str, str]] = []
+        for relPath, outputPath in pages:
+            # Get the newest modification time of the page's templates
+            templateMTime = self._getTemplateMTime(env, relPath, resolvedMTimes)
+
+            # Get the modification time of the output
+            try:
+                outputMTime = os.stat(outputPath).st_mtime_ns
+            except FileNotFoundError:
+                outputMTime = None
+
+            # Check if rendering is needed
+            if (templateMTime is None) or (outputMTime is None) or (outputMTime < templateMTime):
+                changedPages.append((relPath, outputPath))
+
+        # Report
+        print(f"Skipping {len(pages) - len(changedPages)} unchanged page(s).")
+
+        return changedPages
+
+    def _getTemplateMTime(self, env: "jinja2.Environment", name: str, resolved: dict[str, Optional[int]]) -> Optional[int]:
+        """
+        Returns the newest modification time of the template `name` and every template it references through `extends`, `include`, or `import`.
+        References found in previous builds are reused from the build state for templates that have not changed.
+
+        env: The Jinja2 environment containing the templates.
+        name: The name of the template as known to the `env`.
+        resolved: A dictionary of the already resolved templates' times to reuse and add to.
+
+        Returns the modification time in nanoseconds or `None` if it cannot be determined like when a template is chosen dynamically.
+        """
+        # Check if already resolved
+        if name in resolved:
+            return resolved[name]
+
+        resolved[name] = None # Placeholder against circular references
+
+        # Find the template file
+        filePath = self._findTemplateFile(name)
+        if filePath is None:
+            return None
+
+        newestMTime = os.stat(filePath).st_mtime_ns
+
+        # Check the referenced templates
+        for reference in self._getTemplateReferences(env, name, filePath, newestMTime):
+            # Check if the reference is dynamic
+            if reference is None:
+                return None
+
+            referenceMTime = self._getTemplateMTime(env, reference, resolved)
+            if referenceMTime is None:
+                return None
+
+            newestMTime = max(newestMTime, referenceMTime)
+
+        # Record it
+        resolved[name] = newestMTime
+
+        return newestMTime
+
+    def _getTemplateReferences(self, env: "jinja2.Environment", name: str, filePath: str, mtime: int) -> list[Optional[str]]:
+        """
+        Returns the names of the templates the template `name` references through `extends`, `include`, or `import`.
+        References found in previous builds are reused from the build state for templates that have not changed.
+
+        env: The Jinja2 environment containing the templates.
+        name: The name of the template as known to the `env`.
+        filePath: The path of the template file.
+        mtime: The modification time of the template file in nanoseconds.
+
+        Returns the referenced names where `None` marks a template chosen dynamically.
+        """
+        import jinja2.meta
+
+        # Check the build state
+        templateStates: dict[str, Any] = self._buildState.setdefault("templates", {})
+        templateState = templateStates.get(name)
+        if (templateState is not None) and (templateState["mtime"] == mtime):
+            return templateState["references"]
+
+        # Find the references
+        source = Path(filePath).read_text(encoding="utf-8")
+        references = list(jinja2.meta.find_referenced_templates(env.parse(source)))
+        templateStates[name] = {
+            "mtime": mtime,
+            "references": references
+        }
+
+        return references
+
+    def _findTemplateFile(self, name: str) -> Optional[str]:
+        """
+        Finds the file of the template `name` the same way the template loader does.
+
+        name: The name of the template.
+
+        Returns the path of the template file or `None` if it does not exist.
+        """
+        import jinja2.loaders
+
+        pieces = jinja2.loaders.split_template_path(name)
+        for searchPath in self._getTemplateSearchPaths():
+            filePath = os.path.join(searchPath, *pieces)
+            if os.path.isfile(filePath):
+                return filePath
+
+        return None
+
+    def _getConfigHash(self) -> str:
+        """
+        Returns a hash of the site configuration that is rendered into every page.
+        """
+        import json
+
+        return hashlib.sha1(
+            json.dumps([self.rootUrl, self.socialLinks, self.overrides], sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _loadBuildState(self) -> dict[str, Any]:
+        """
+        Loads the record of the last build from the cache directory.
+        The record is removed once loaded so an interrupted build cannot leave a record that does not match the output.
+
+        Returns the record or an empty dictionary if there is none.
+        """
+        import json
+
+        statePath = self.cacheDir / BUILD_STATE_FILE_NAME
+        try:
+            state = json.loads(statePath.read_bytes())
+            statePath.unlink()
+            return state
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _saveBuildState(self):
+        """
+        Saves the record of this build to the cache directory.
+        """
+        import json
+
+        # Update the record
+        self._buildState["cacheVersion"] = self._cacheVersion
+        self._buildState["configHash"] = self._getConfigHash()
+
+        # Write it
+        self.cacheDir.mkdir(parents=True, exist_ok=True)
+        (self.cacheDir / BUILD_STATE_FILE_NAME).write_text(json.dumps(self._buildState), encoding="utf-8")
+
+    def _isBlacklisted(self, name: str) -> bool:
+        """
+        Checks if the given file or directory `name` is excluded from the build output by the blacklist.
+
+        name: The file or directory name to check.
+
+        Returns `True` if the name is blacklisted.
+        """
+        return (name in self.copyBlacklist) or ((self._copyBlacklistPattern is not None) and (self._copyBlacklistPattern.match(name) is not None))
+
+    def _walkFiles(self) -> Iterator[tuple[bool, str, str, str]]:
+        """
+        Walks all files in the input directory and prepares their output directories as they are reached.
+        Directories are walked from a stack instead of recursively so each one is a single flat `os.scandir` pass.
+
+        Yields a `(isPage, inputPath, relPath, outputPath)` tuple for each file where `isPage` is `True` for HTML pages that need rendering and `relPath` is the POSIX style path relative to the source directory.
+        """
+        # NOTE: Paths are handled as strings since every path here is within the source directory and `Path` operations are comparatively slow.
+        pendingDirs: list[str] = [self._sourceDirStr]
+        while pendingDirs:
+            # Determine the roots
+            rootInput = pendingDirs.pop()
+            rootOutput = self._outputDirStr + rootInput[(self._sourceDirLen - 1):]
+
+            # Create the output root, if needed
+            os.makedirs(rootOutput, exist_ok=True)
+
+            # Sort the directory's entries by the action they require
+            # NOTE: Entries from `os.scandir` cache their file type so no additional `stat` calls are needed here.
+            with os.scandir(rootInput) as entries:
+                for entry in entries:
+                    if self._isBlacklisted(entry.name):
+                        # Skip blacklisted items
+                        continue
+                    elif entry.is_dir():
+                        # Walk the directory later
+                        pendingDirs.append(entry.path)
+                    elif not entry.is_file():
+                        # Report unknown item
+                        print(f"Unhandled file system item type at: {entry.path}")
+                    else:
+                        yield (
+                            entry.name.lower().endswith(".html"),
+                            entry.path,
+                            self._getSourceRelativePath(entry.path),
+                            os.path.join(rootOutput, entry.name)
+                        )
+
+    def _getSourceRelativePath(self, path: str) -> str:
+        """
+        Returns the POSIX style relative path of the given absolute `path` within the source directory.
+
+        path: An absolute path string within the source directory.
+        """
+        relPath = path[self._sourceDirLen:]
+        if os.sep != "/":
+            relPath = relPath.replace(os.sep, "/")
+
+        return relPath
+
+    def _renderPages(self, env: "jinja2.Environment", pages: list[tuple[str, str]]):
+        """
+        Renders the HTML pages to the output directory.
+        Rendering is CPU bound so it is spread across processes when there are enough pages to outweigh the cost of starting them.
+
+        env: The Jinja2 environment containing the templates.
+        pages: A list of `(relPath, outputPath)` tuples to render where `relPath` is the POSIX style path of the page relative to the source directory.
+        """
+        from tqdm import tqdm
+
+        # Build the payload shared by every page once
+        basePayload = self._getBaseJinjaPayload()
+
+        # Get the hashes of the pages from the last build
+        pageHashes: dict[str, str] = self._buildState.setdefault("pageHashes", {})
+
+        # Check if rendering in this process is cheaper
+        if (len(pages) < PARALLEL_RENDER_THRESHOLD) or ((os.cpu_count() or 1) <= 1):
+            for relPath, outputPath in tqdm(pages, desc="Rendering pages", unit="page"):
+                pageHashes[relPath] = _renderPage(env, relPath, basePayload, self._getPagePath(relPath), outputPath, pageHashes.get(relPath))
+
+            return
+
+        # Prepare the jobs
+        jobs = [(relPath, self._getPagePath(relPath), outputPath, pageHashes.get(relPath)) for relPath, outputPath in pages]
+
+        # Compile the templates once before the workers need them
+        if self._getTemplateCacheDir() is not None:
+            self._compileTemplates(env, [relPath for relPath, _ in pages])
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Render across processes
+        # NOTE: Workers are spawned instead of forked since forking while the clean up and progress bar threads are running can deadlock.
+        with ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initRenderWorker,
+            initargs=(self._getTemplateSearchPaths(), self._getTemplateCacheDir(), basePayload)
+        ) as executor:
+            for (relPath, _), pageHash in zip(pages, tqdm(
+                executor.map(_renderPageWorker, jobs, chunksize=4),
+                total=len(jobs),
+                desc="Rendering pages",
+                unit="page"
+            )):
+                pageHashes[relPath] = pageHash
+
+    def _compileTemplates(self, env: "jinja2.Environment", pageNames: list[str]):
+        """
+        Compiles the given page templates and every template they reference ahead of rendering.
+        Otherwise each render worker would compile shared templates like `page.html` on its own. The workers load the compiled templates from the template cache so this is only useful when the cache is enabled.
+        Templates chosen dynamically cannot be found ahead of time so the workers compile those themselves.
+
+        env: The Jinja2 environment containing the templates.
+        pageNames: The names of the page templates to compile.
+        """
+        # Collect the pages and the templates they reference
+        names = set(pageNames)
+        pendingNames = list(names)
+        while pendingNames:
+            name = pendingNames.pop()
+            filePath = self._findTemplateFile(name)
+            if filePath is None:
                 continue
-            elif inputPath.suffix.lower() == ".html":
-                # Construct HTML file
-                # Build the payload
-                payload = self._getStandardJinjaPayload(inputPath)
-
-                # Get the template
-                template = env.get_template(
-                    name=inputPath.relative_to(self.sourceDir).as_posix(),
-                    globals=payload
-                )
 
-                # Render the template with the content file
-                html = template.render()
-
-                # Ensure output directory exists
-                outputPath.parent.mkdir(parents=True, exist_ok=True)
-
-                # Write the rendered HTML to the output directory
-                with open(outputPath, "w", encoding="utf-8") as f:
-                    f.write(minify_html.minify(
-                        html,
-                        keep_closing_tags=True,
-                        minify_css=True,
-                        minify_js=True,
-                        remove_processing_instructions=True
-                    ))
-            elif inputPath.is_file():
-                # Ensure output directory exists
-                outputPath.parent.mkdir(parents=True, exist_ok=True)
-
-                # Copy regular files
-                copy2(inputPath, outputPath)
-            else:
-                # Report unknown item
-                print(f"Unhandled file system item type at: {inputPath}")
+            for reference in self._getTemplateReferences(env, name, filePath, os.stat(filePath).st_mtime_ns):
+                if (reference is not None) and (reference not in names):
+                    names.add(reference)
+                    pendingNames.append(reference)
+
+        # Compile them
+        for name in names:
+            env.get_template(name)
 
     def _updateSiteWebManifest(self):
         """
         Updates the `site.webmanifest` file in the output directory.
+        Only the updated values are replaced so the rest of the manifest keeps its original formatting.
         """
-        # Update the site.webmanifest
-        manifestPath = (self.outputDir / "images" / "favicon" / "site.webmanifest").absolute()
-        if manifestPath.exists():
-            # Open the manifest
-            with open(manifestPath, "r") as f:
-                manifest = json.load(f)
+        import json
 
-            # Update the manifest
-            manifest["name"] = self.name
-            manifest["short_name"] = self.nameShort
+        # Check if the site.webmanifest exists
+        manifestPath = (self.outputDir / "images" / "favicon" / "site.webmanifest").absolute()
+        if not manifestPath.exists():
+            # Report
+            print("No favicon 'site.webmanifest' exists. Skipping update.")
+            return
 
-            # Write the manifest back
-            with open(manifestPath, "w") as f:
-                json.dump(manifest, f, indent=2)
+        # Open the manifest
+        rawManifest = manifestPath.read_bytes()
+        manifest = _loadJson(rawManifest)
 
+        # Check if an update is needed
+        updates = {
+            "name": self.name,
+            "short_name": self.nameShort
+        }
+        if all((manifest.get(key) == value) for key, value in updates.items()):
             # Report
-            print("Favicon 'site.webmanifest' updated.")
-        else:
-            # Report
-            print("No favicon 'site.webmanifest' exists. Skipping update.")
+            print("Favicon 'site.webmanifest' is up to date.")
+            return
+
+        # Patch the values in place
+        patchedManifest: Optional[bytes] = rawManifest
+        for key, value in updates.items():
+            replacement = f'"{key}": {json.dumps(value, ensure_ascii=False)}'.encode("utf-8")
+            patchedManifest, count = re.subn(
+                rb'"' + re.escape(key.encode("utf-8")) + rb'"\s*:\s*"(?:[^"\\]|\\.)*"',
+                lambda _: replacement,
+                patchedManifest,
+                count=1
+            )
+
+            if count == 0:
+                patchedManifest = None
+                break
+
+        # Check if the patch missed or hit the wrong keys like a nested `name`
+        if (patchedManifest is None) or (_loadJson(patchedManifest) != {**manifest, **updates}):
+            # Rewrite the whole manifest instead
+            patchedManifest = _dumpJsonIndented({**manifest, **updates})
+
+        # Write the manifest back
+        manifestPath.write_bytes(patchedManifest)
+
+        # Report
+        print("Favicon 'site.webmanifest' updated.")
 
-    def _buildAttributionsPage(self, env: jinja2.Environment):
+    def _buildAttributionsPage(self, env: "jinja2.Environment"):
         """
         Builds the attributions page.
 
@@ -355,15 +988,19 @@ class BuildTool(BaseTool):
         # Prepare the path
         attrsPath = self.outputDir / "attributions.html"
 
+        # Read the attribution files across threads
+        # NOTE: Reading is I/O bound so the threads overlap the time spent waiting on the disk.
+        with ThreadPoolExecutor(max_workers=min(32, len(self.attributions) or 1)) as executor:
+            contents = list(executor.map(lambda item: item.filePath.read_text(encoding="utf-8"), self.attributions))
+
         # Build the attributions list for payload
         payloadAttrData: dict[str, list[dict[str, str]]] = {}
-        for item in self.attributions:
+        for item, itemDict, content in zip(self.attributions, AttrItem.manyToDicts(self.attributions), contents):
             # Prep the item dict
-            itemDict = item.toDict()
             itemDict["filePath"] = item.filePath.relative_to(self.sourceDir).as_posix() # NOTE: Notice it's relative to sourceDir because that's where the `filePath` is pointing!
 
-            # Get the content
-            itemDict["content"] = item.filePath.read_text(encoding="utf-8")
+            # Add the content
+            itemDict["content"] = content
 
             # Add the category if needed
             if item.category not in payloadAttrData:
@@ -377,25 +1014,16 @@ class BuildTool(BaseTool):
         payload["attributions"] = payloadAttrData
 
         # Get the template
-        template = env.get_template(
-            name=attrsPath.name,
-            globals=payload
-        )
+        template = env.get_template(attrsPath.name)
 
         # Render the template with the content file
-        html = template.render()
+        html = template.render(payload)
 
         # Write the rendered HTML to the output directory
-        with open(self.outputDir / attrsPath.name, "w") as f:
-            f.write(minify_html.minify(
-                html,
-                keep_closing_tags=True,
-                minify_css=True,
-                minify_js=True,
-                remove_processing_instructions=True
-            ))
+        pageHashes: dict[str, str] = self._buildState.setdefault("pageHashes", {})
+        pageHashes[attrsPath.name] = _writeMinified(str(self.outputDir / attrsPath.name), html, pageHashes.get(attrsPath.name))
 
-    def _buildSitemap(self, env: jinja2.Environment):
+    def _buildSitemap(self, env: "jinja2.Environment"):
         """
         Generates the `sitemap.xml` file in the output directory.
 
@@ -404,39 +1032,58 @@ class BuildTool(BaseTool):
         # Prepare the path
         sitemapPath = self.outputDir / "sitemap.xml"
 
-        # Get all the HTML files
-        htmlFiles = tuple(self.outputDir.glob("**/*.html"))
-
         # Build the payload
         payload = self._getStandardJinjaPayload(sitemapPath, relPath=sitemapPath.name)
+        # NOTE: Sorted so the sitemap does not change with the order the file system lists the pages in.
         payload["entries"] = [
-            {
-                "loc": f"{self.rootUrl}/{htmlFile.relative_to(self.outputDir).as_posix()}",
-                "lastmod": datetime.datetime.fromtimestamp(htmlFile.stat().st_mtime, datetime.timezone.utc).strftime("%Y-%m-%d")
-            }
-            for htmlFile in htmlFiles
+            SitemapEntry(
+                loc=f"{self.rootUrl}/{relPath}",
+                lastmod=time.strftime("%Y-%m-%d", time.gmtime(mtime))
+            )
+            for relPath, mtime in sorted(self._walkHtml())
         ]
 
         # Get the template
-        template = env.get_template(
-            name=sitemapPath.name,
-            globals=payload
-        )
+        template = env.get_template(sitemapPath.name)
 
-        # Render the template with the content file
-        xml = template.render()
+        # Render the template straight into the output directory
+        # NOTE: Streamed in buffered chunks so large sitemaps are never held in memory as a whole.
+        stream = template.stream(payload)
+        stream.enable_buffering(size=64)
+        stream.dump(str(sitemapPath), encoding="utf-8")
 
-        # Write the rendered XML to the output directory
-        with open(self.outputDir / sitemapPath.name, "w") as f:
-            f.write(xml)
+    def _walkHtml(self) -> Iterator[tuple[str, float]]:
+        """
+        Walks the output directory for HTML files.
+
+        Yields a `(relPath, mtime)` tuple for each HTML file where `relPath` is the POSIX style path relative to the output directory.
+        """
+        # NOTE: The modification time comes from `DirEntry.stat` which reuses what the directory scan already knows where possible.
+        pendingDirs = deque((self._outputDirStr, ))
+        while pendingDirs:
+            rootDir = pendingDirs.popleft()
+            with os.scandir(rootDir) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Walk the directory later
+                        pendingDirs.append(entry.path)
+                    elif entry.name.endswith(".html"):
+                        relPath = entry.path[self._outputDirLen:]
+                        if os.sep != "/":
+                            relPath = relPath.replace(os.sep, "/")
+
+                        yield (relPath, entry.stat(follow_symlinks=False).st_mtime)
 
     def _startStaticFileSyncWatcher(self):
         """
         Starts the static file synchronization watcher to monitor changes in the output directory and write them back to the source directory.
         """
+        from .sync import SyncTool
+
         # Create the syncing tool
         self._syncTool = SyncTool(
             watchDir=self.outputDir,
-            resultDir=self.sourceDir
+            resultDir=self.sourceDir,
+            pollInterval=self.syncPollInterval
         )
         self._syncTool.watch()
@@ -4,10 +4,9 @@ Open Tool
 Opens the static site in the default web browser.
 """
 # MARK: Imports
-import webbrowser
+import os
 import argparse
 from typing import Optional
-from pathlib import Path
 
 from .baseTool import BaseTool
 from ..config import Config
@@ -51,13 +50,16 @@ class OpenTool(BaseTool):
         args: The parser arguments to create the tool from.
         config: The config manager to use for the tool.
         """
+        import webbrowser
+
         # Get the path
-        homePath = Path(config.get("build", "outputDirectory")).absolute() / "index.html"
+        homePath = os.path.join(os.path.abspath(config.get("build", "outputDirectory")), "index.html")
 
         # Check if it exists
-        if not homePath.is_file():
+        # NOTE: Browsers do not report a missing file back so this is the only chance to give a useful error.
+        if not os.path.isfile(homePath):
             print("Error: The static site has not been built yet. Please run the `build` tool first.")
             return
 
         # Just open the thing
-        webbrowser.open(str(homePath))
+        webbrowser.open(homePath)
@@ -4,23 +4,108 @@ Static File Synchronization Tool
 Tool to watch for changes in *static* files in the project's *output* directory and writes them back to the *source* directory.
 """
 # MARK: Imports
+import os
+import re
+import sys
 import time
+import signal
 import argparse
-from typing import Optional
+import threading
+import fnmatch
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
 from pathlib import Path
-from shutil import copy2
+from shutil import copystat
 
-from watchdog.events import FileSystemEvent, FileSystemEventHandler, FileModifiedEvent
-from watchdog.observers import Observer
+from watchdog.events import FileSystemEvent, FileSystemEventHandler, FileModifiedEvent, FileClosedEvent
 
 from .baseTool import BaseTool
 from ..config import Config
+from ..utils import fastCopy, sameContent
+
+# MARK: Constants
+# Types of events that report a changed file
+# NOTE: On Linux, inotify reports when a file opened for writing is closed so each save is reported once when it is complete instead of once per write.
+CHANGE_EVENT_TYPES: tuple[type[FileSystemEvent], ...] = (FileClosedEvent, ) if sys.platform.startswith("linux") else (FileModifiedEvent, )
+
+# File name patterns of editor and system files that are never synchronized
+IGNORE_PATTERNS = ("*.swp", "*.swx", "*~", "*.tmp", ".DS_Store")
+_IGNORE_PATTERN = re.compile("|".join(fnmatch.translate(pattern) for pattern in IGNORE_PATTERNS), re.IGNORECASE)
+
+# Types of network file systems that do not report changes and must be polled instead
+NETWORK_FILESYSTEM_TYPES = frozenset(("nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "fuse.sshfs"))
+
+# MARK: - Functions
+def _getFileSystemType(path: str) -> Optional[str]:
+    """
+    Finds the type of the file system the `path` is on from the mount table.
+    Only supported on Linux.
+
+    path: The path to check.
+
+    Returns the file system type like `ext4` or `nfs4` or `None` if it cannot be determined.
+    """
+    # Load the mount table
+    try:
+        with open("/proc/self/mountinfo", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    # Find the deepest mount point containing the path
+    # NOTE: Mounts listed later are mounted over earlier ones at the same point.
+    path = os.path.realpath(path)
+    bestMountPoint = ""
+    bestType: Optional[str] = None
+    for line in lines:
+        # Split the mount's fields from its file system fields
+        mountFields, _, fsFields = line.partition(" - ")
+        mountFields = mountFields.split(" ")
+        fsFields = fsFields.split(" ")
+        if len(mountFields) < 5:
+            continue
+
+        # Check the mount point
+        mountPoint = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), mountFields[4])
+        if ((path == mountPoint) or path.startswith(mountPoint.rstrip("/") + "/")) and (len(mountPoint) >= len(bestMountPoint)):
+            bestMountPoint = mountPoint
+            bestType = fsFields[0]
+
+    return bestType
+
+@functools.lru_cache(maxsize=4096)
+def _resolvePaired(srcPath: str, watchDir: str, resultDir: str) -> Optional[str]:
+    """
+    Resolves the path of the file paired with the `srcPath` in the `resultDir`.
+    Cached since the same files tend to change repeatedly.
+
+    srcPath: The path of the changed file.
+    watchDir: The normalized absolute path of the watch directory.
+    resultDir: The normalized absolute path of the result directory.
+
+    Returns the absolute path of the paired file or `None` if the `srcPath` is not within the `watchDir`.
+    """
+    srcPath = os.path.abspath(srcPath)
+    if not srcPath.startswith(watchDir + os.sep):
+        return None
+
+    return resultDir + srcPath[len(watchDir):]
 
 # MARK: - Static File Synchronization Watcher
 class _SFSyncWatcher(FileSystemEventHandler):
     """
     Watches for changes in static files in the project's output directory and writes them back to the source directory.
+    The first change to a file is synchronized immediately while further changes within the buffer delay are collected into a single trailing synchronization so the final state of the file is never missed.
+    Synchronizations are queued for a worker thread so the observer thread is never held up by disk I/O.
     """
+    # Constants
+    MAX_TRACKED_PATHS = 4096 # files
+    MAX_TRAILING_DELAY = 0.5 # seconds
+    MAX_BATCH_SIZE = 64 # files
+    MAX_CONCURRENT_COPIES = 8 # files
+
     # Initializer
     def __init__(self, watchDir: Path, resultDir: Path, bufferDelay: float):
         """
@@ -35,23 +120,37 @@ class _SFSyncWatcher(FileSystemEventHandler):
         self.watchDir: Path = watchDir.absolute()
         self.resultDir: Path = resultDir.absolute()
         self.bufferDelay: float = bufferDelay # seconds
-        self.events: dict[FileSystemEvent, float] = {} # { event: timestamp }
 
-    # Functions
-    def on_modified(self, event: FileModifiedEvent):
-        # Check if the event is already buffered
-        currentTime = time.time()
-        if event in self.events:
-            lastTime = self.events[event]
-            if (currentTime - lastTime) < self.bufferDelay:
-                # Still in buffer delay, ignore
-                return
+        # NOTE: Normalized the same way as event paths so directories given with `..` still match them.
+        self._watchDirStr: str = os.path.abspath(self.watchDir)
+        self._resultDirStr: str = os.path.abspath(self.resultDir)
+
+        self._lock: threading.Lock = threading.Lock()
+        self._lastFired: OrderedDict[str, float] = OrderedDict() # { source path: monotonic timestamp } from least to most recently synchronized
+        self._pending: dict[str, float] = {} # { source path: monotonic timestamp of the first buffered event }
+        self._pendingTimers: dict[str, threading.Timer] = {} # { source path: trailing synchronization timer }
+        self._pendingDeadlines: dict[str, float] = {} # { source path: monotonic timestamp the trailing synchronization is scheduled for }
 
-        # Record the event time
-        self.events[event] = currentTime
+        self._queue: OrderedDict[str, None] = OrderedDict() # { source path: None } in the order they were queued
+        self._queueCondition: threading.Condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._copyExecutor: Optional[ThreadPoolExecutor] = None
+        self._reportLock: threading.Lock = threading.Lock()
+        self._stopping: bool = False
+
+    # Functions
+    def on_closed(self, event: FileClosedEvent):
+        # Handle a file closed after writing like any other modification
+        self.on_modified(event)
+
+    def on_modified(self, event: Union[FileModifiedEvent, FileClosedEvent]):
+        # Skip directories and ignored files
+        # NOTE: Checked before anything else since editors can produce many events for their temporary files.
+        if event.is_directory or (_IGNORE_PATTERN.match(os.path.basename(event.src_path)) is not None):
+            return
 
         # Determine event's source path
-        srcPath = Path(event.src_path).absolute()
+        srcPath = event.src_path
 
         # Make sure there's no destination path
         # Only process files that are modified *in place*!
@@ -62,25 +161,252 @@ class _SFSyncWatcher(FileSystemEventHandler):
             return
 
         # Make sure the file is in the watchDir
-        if not srcPath.is_relative_to(self.watchDir):
+        if _resolvePaired(srcPath, self._watchDirStr, self._resultDirStr) is None:
             # Report
             print(f"Received a `FileModifiedEvent` for a file outside the watch directory. Build system may be setup incorrectly!\nIgnoring change at: {srcPath}")
             return
 
+        # Check if the file was synchronized recently
+        # NOTE: Events are keyed by path since `FileSystemEvent` objects are recreated for every change.
+        path = srcPath
+        with self._lock:
+            currentTime = time.monotonic()
+            lastTime = self._lastFired.get(path)
+            if (lastTime is not None) and ((currentTime - lastTime) < self.bufferDelay):
+                # Buffer the change into a trailing synchronization
+                self._schedulePending(path, currentTime)
+                return
+
+            # Record the synchronization time
+            self._recordFired(path, currentTime)
+
+        # Synchronize the change right away
+        self._enqueue(path)
+
+    def start(self):
+        """
+        Starts the worker thread that performs the queued synchronizations.
+        """
+        self._stopping = False
+        self._copyExecutor = ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_COPIES, thread_name_prefix="SFSyncCopy")
+        self._worker = threading.Thread(target=self._processQueue, name="SFSyncWorker", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """
+        Synchronizes every buffered and queued change and then stops the worker thread.
+        """
+        # Queue the buffered changes
+        self.flush()
+
+        # Let the worker finish the queue
+        with self._queueCondition:
+            self._stopping = True
+            self._queueCondition.notify()
+
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+        if self._copyExecutor is not None:
+            self._copyExecutor.shutdown()
+            self._copyExecutor = None
+
+    def flush(self):
+        """
+        Synchronizes every buffered change right away instead of waiting for its trailing synchronization.
+        """
+        # Stop the trailing synchronizations
+        with self._lock:
+            paths = list(self._pendingTimers.keys())
+            for timer in self._pendingTimers.values():
+                timer.cancel()
+
+        # Synchronize them now
+        for path in paths:
+            self._flushPending(path)
+
+    # Private Functions
+    def _schedulePending(self, path: str, currentTime: float):
+        """
+        Schedules the trailing synchronization of the file at `path` or moves it later.
+        The synchronization happens `bufferDelay` after the latest change but never beyond `MAX_TRAILING_DELAY` after the first buffered change so a file that keeps changing is still synchronized.
+        Must be called while holding the lock.
+
+        path: The source path of the changed file.
+        currentTime: The current `time.monotonic()` timestamp.
+        """
+        # Calculate when to synchronize
+        firstTime = self._pending.setdefault(path, currentTime)
+        self._pendingDeadlines[path] = min(currentTime + self.bufferDelay, firstTime + self.MAX_TRAILING_DELAY)
+
+        # Check if a synchronization is already scheduled
+        # NOTE: The running timer checks the latest deadline when it expires so each change does not need a new timer.
+        if path in self._pendingTimers:
+            return
+
+        # Schedule the synchronization
+        self._startPendingTimer(path, self._pendingDeadlines[path] - currentTime)
+
+    def _startPendingTimer(self, path: str, delay: float):
+        """
+        Starts the timer for the trailing synchronization of the file at `path`.
+        Must be called while holding the lock.
+
+        path: The source path of the changed file.
+        delay: The delay in seconds before the timer expires.
+        """
+        timer = threading.Timer(max(0.0, delay), self._onPendingTimer, args=(path, ))
+        timer.daemon = True
+        self._pendingTimers[path] = timer
+        timer.start()
+
+    def _onPendingTimer(self, path: str):
+        """
+        Performs the trailing synchronization of the file at `path` once its latest deadline has passed.
+
+        path: The source path of the changed file.
+        """
+        # Check if the deadline was moved later while waiting
+        with self._lock:
+            deadline = self._pendingDeadlines.get(path)
+            if deadline is None:
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                self._startPendingTimer(path, remaining)
+                return
+
+        # Synchronize the change
+        self._flushPending(path)
+
+    def _flushPending(self, path: str):
+        """
+        Performs the buffered trailing synchronization of the file at `path` if it is still pending.
+
+        path: The source path of the changed file.
+        """
+        # Check if still pending
+        with self._lock:
+            if self._pending.pop(path, None) is None:
+                return
+
+            self._pendingTimers.pop(path, None)
+            self._pendingDeadlines.pop(path, None)
+            self._recordFired(path, time.monotonic())
+
+        # Synchronize the change
+        self._enqueue(path)
+
+    def _enqueue(self, path: str):
+        """
+        Queues the synchronization of the file at `path` for the worker thread.
+        A file that is already queued keeps its place so repeated changes collapse into one synchronization of its latest state.
+
+        path: The source path of the changed file.
+        """
+        with self._queueCondition:
+            self._queue[path] = None
+            self._queueCondition.notify()
+
+    def _processQueue(self):
+        """
+        Performs the queued synchronizations until stopped and the queue is empty.
+        Runs on the worker thread.
+        """
+        while True:
+            # Wait for the next queued files
+            # NOTE: Queued files are taken in batches so bursts of changes do not contend for the lock on every file.
+            with self._queueCondition:
+                while (not self._queue) and (not self._stopping):
+                    self._queueCondition.wait()
+
+                if not self._queue:
+                    return
+
+                batch = [self._queue.popitem(last=False)[0] for _ in range(min(len(self._queue), self.MAX_BATCH_SIZE))]
+
+            # Synchronize them
+            # NOTE: Files in a batch are unique so they are copied concurrently to overlap the time spent waiting on slow disks. The batch is finished before the next is taken so a file is never copied by two threads at once.
+            if len(batch) == 1:
+                self._trySyncFile(batch[0])
+            else:
+                for _ in self._copyExecutor.map(self._trySyncFile, batch):
+                    pass
+
+    def _trySyncFile(self, srcPath: str):
+        """
+        Synchronizes the file at `srcPath` like `_syncFile` while reporting any failure instead of raising it.
+
+        srcPath: The path of the changed file within the watch directory.
+        """
+        try:
+            self._syncFile(srcPath)
+        except OSError as e:
+            # Report
+            self._report(f"Failed to synchronize change at: {srcPath}\n{e}")
+
+    def _syncFile(self, srcPath: str):
+        """
+        Writes the changed file at `srcPath` back to its paired file in the result directory.
+
+        srcPath: The path of the changed file within the watch directory.
+        """
         # Determine paired file path in resultDir
-        pairedFilePath = self.resultDir / srcPath.relative_to(self.watchDir)
+        pairedFilePath = _resolvePaired(srcPath, self._watchDirStr, self._resultDirStr)
 
-        # Make sure the paired file is in the resultDir
-        if not pairedFilePath.exists():
+        # Get the state of both files
+        # NOTE: The paired file is checked first so a missing paired file is reported here without a separate existence check.
+        try:
+            pairedStat = os.stat(pairedFilePath)
+        except FileNotFoundError:
             # Report
-            print(f"Paired file does not exist in the build output directory. Verify the file exists in your source directory and rebuild the site output!\nIgnoring change at: {srcPath}")
+            self._report(f"Paired file does not exist in the build output directory. Verify the file exists in your source directory and rebuild the site output!\nIgnoring change at: {srcPath}")
+            return
+
+        srcStat = os.stat(srcPath)
+
+        # Check if the paired file is newer than the change
+        # NOTE: Only a strictly newer paired file is trusted. Equal times are left to the content check since a save of the same size can land within the same timestamp tick as the last synchronization.
+        if (pairedStat.st_size == srcStat.st_size) and (pairedStat.st_mtime_ns > srcStat.st_mtime_ns):
+            return
+
+        # Check if the content actually changed
+        # NOTE: Editors often save files without changing them so this avoids rewriting the source directory for nothing.
+        if sameContent(srcPath, pairedFilePath):
             return
 
         # Do the copy back to the resultDir
-        copy2(srcPath, pairedFilePath)
+        # NOTE: Content is copied within the kernel where possible and the metadata is then carried over like `copy2` would.
+        fastCopy(srcPath, pairedFilePath)
+        copystat(srcPath, pairedFilePath)
 
         # Report
-        print(f"Synchronized: {pairedFilePath.relative_to(self.resultDir.parent)}")
+        self._report(f"Synchronized: {os.path.relpath(pairedFilePath, self.resultDir.parent)}")
+
+    def _report(self, message: str):
+        """
+        Prints the `message` without interleaving it with messages printed by other copy threads.
+
+        message: The message to print.
+        """
+        with self._reportLock:
+            print(message)
+
+    def _recordFired(self, path: str, currentTime: float):
+        """
+        Records when the file at `path` was last synchronized.
+        Only the `MAX_TRACKED_PATHS` most recently synchronized files are remembered so a long session does not keep growing the record. Forgotten files are simply synchronized right away on their next change.
+        Must be called while holding the lock.
+
+        path: The source path of the synchronized file.
+        currentTime: The current `time.monotonic()` timestamp.
+        """
+        self._lastFired[path] = currentTime
+        self._lastFired.move_to_end(path)
+        if len(self._lastFired) > self.MAX_TRACKED_PATHS:
+            self._lastFired.popitem(last=False)
 
 # MARK: - Sync Tool
 class SyncTool(BaseTool):
@@ -91,12 +417,17 @@ class SyncTool(BaseTool):
     TOOL_NAME = "sync"
     TOOL_HELP = "Watch for changes in *static* files in the project's *output* directory and writes them back to the *source* directory."
 
+    # Interval to wake up while waiting to be stopped or `None` to wait without waking
+    # NOTE: On Windows, a wait without a timeout cannot be interrupted by CTRL+C.
+    STOP_CHECK_INTERVAL: Optional[float] = 1.0 if (sys.platform == "win32") else None # seconds
+
     # Initializer
-    def __init__(self, watchDir: Path, resultDir: Path, bufferDelay: float = 1.0):
+    def __init__(self, watchDir: Path, resultDir: Path, bufferDelay: float = 1.0, pollInterval: float = 5.0):
         """
         watchDir: The directory that changes could occur in and should be synced back to the `resultDir`.
         resultDir: The directory that changes should be written back to when they occur in the `watchDir`.
         bufferDelay: The delay in seconds to buffer events to avoid duplicate processing and repeated events.
+        pollInterval: The interval in seconds to poll for changes when the `watchDir` is on a network file system.
         """
         # Setup
         super().__init__()
@@ -106,8 +437,10 @@ class SyncTool(BaseTool):
         self.resultDir: Path = resultDir.absolute()
 
         self._bufferDelay: float = bufferDelay # seconds
+        self._pollInterval: float = pollInterval # seconds
         self._changeHandler: Optional[_SFSyncWatcher] = None
         self._changeObserver = None
+        self._stopEvent: threading.Event = threading.Event()
 
     # CLI Functions
     @staticmethod
@@ -125,6 +458,12 @@ class SyncTool(BaseTool):
             default=1.0,
             help="The delay in seconds to buffer events to avoid duplicate processing and repeated events. (default: %(default)s)"
         )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="The interval in seconds to poll for changes when the output directory is on a network file system. (default: %(default)s)"
+        )
 
     @classmethod
     def fromArgs(cls, args: argparse.Namespace, config: Optional[Config]) -> "BaseTool":
@@ -139,7 +478,8 @@ class SyncTool(BaseTool):
         return cls(
             watchDir=Path(config.get("build", "outputDirectory")),
             resultDir=Path(config.get("build", "sourceDirectory")),
-            bufferDelay=args.delay
+            bufferDelay=args.delay,
+            pollInterval=args.poll_interval
         )
 
     def _run(self, args: argparse.Namespace, config: Optional[Config]):
@@ -159,6 +499,9 @@ class SyncTool(BaseTool):
         """
         Starts watching for changes in static files in the watch directory and writes them back to the result directory.
         """
+        from watchdog.observers import Observer
+        from watchdog.observers.polling import PollingObserver
+
         # Check the directories exist
         if (not self.watchDir.exists()) or (not self.watchDir.is_dir()):
             raise FileNotFoundError(f"Watch directory does not exist or is not a directory: {self.watchDir}")
@@ -178,28 +521,61 @@ class SyncTool(BaseTool):
         )
 
         # Create the observer
-        self._changeObserver = Observer()
+        # NOTE: Network file systems do not report changes made by other machines so they are polled instead. Polling only reports modifications.
+        fsType = _getFileSystemType(str(self.watchDir)) if sys.platform.startswith("linux") else None
+        if fsType in NETWORK_FILESYSTEM_TYPES:
+            # Report
+            print(f"Output directory is on a network file system ({fsType}). Polling for changes every {self._pollInterval} seconds.\n")
+
+            self._changeObserver = PollingObserver(timeout=self._pollInterval)
+            eventTypes = [FileModifiedEvent]
+        else:
+            self._changeObserver = Observer()
+            eventTypes = list(CHANGE_EVENT_TYPES)
+
         self._changeObserver.schedule(
             self._changeHandler,
             str(self.watchDir),
             recursive=True,
-            event_filter=[FileModifiedEvent]
+            event_filter=eventTypes
         )
 
         # Start observing
+        self._changeHandler.start()
         self._changeObserver.start()
 
-        # Enter listening loop
+        # Stop on CTRL+C by setting the stop event instead of raising wherever the main thread happens to be
+        # NOTE: Signal handlers can only be installed from the main thread.
+        isMainThread = (threading.current_thread() is threading.main_thread())
+        if isMainThread:
+            previousSigIntHandler = signal.signal(signal.SIGINT, lambda *_: self._stopEvent.set())
+
+        # Wait until stopped
+        # NOTE: Waiting on an event instead of sleeping in a loop keeps this thread from waking up while idle where the platform allows it.
+        self._stopEvent.clear()
         try:
-            while True:
-                time.sleep(self._bufferDelay)
+            while not self._stopEvent.wait(self.STOP_CHECK_INTERVAL):
+                pass
         except KeyboardInterrupt:
             # Exit on CTRL+C
             pass
         finally:
+            # Restore the previous CTRL+C handling
+            if isMainThread:
+                signal.signal(signal.SIGINT, previousSigIntHandler)
+
             # Clean up
             self._changeObserver.stop()
             self._changeObserver.join()
 
+            # Synchronize any buffered or queued changes
+            self._changeHandler.stop()
+
         # Report
         print("\nStopped watching for static file changes.")
+
+    def stop(self):
+        """
+        Stops watching for changes if currently watching.
+        """
+        self._stopEvent.set()
@@ -0,0 +1 @@
+from .fileOps import fastCopy, writeBytes, sameContent
\ No newline at end of file
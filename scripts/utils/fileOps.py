@@ -0,0 +1,92 @@
+"""
+File Operations
+
+Helper functions for working with files on disk.
+"""
+# MARK: Imports
+import os
+import errno
+import shutil
+from typing import Union
+
+# MARK: Constants
+COPY_CHUNK_SIZE = 1 << 30 # bytes
+COMPARE_CHUNK_SIZE = 1 << 20 # bytes
+
+# Errors that indicate the kernel cannot copy between the given files so another method should be used
+_KERNEL_COPY_UNSUPPORTED_ERRNOS = frozenset((
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+    errno.EPERM
+))
+
+# MARK: Functions
+def fastCopy(src: Union[str, os.PathLike], dst: Union[str, os.PathLike]):
+    """
+    Copies the content of the `src` file to the `dst` file without copying any metadata.
+    Uses `os.copy_file_range` when available so data is copied within the kernel (or shared on copy-on-write filesystems) and falls back to `shutil.copyfile` otherwise.
+
+    src: The path of the file to copy.
+    dst: The path to copy the file to. Will be overwritten if it exists.
+    """
+    # Check if the kernel can copy directly
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fSrc, open(dst, "wb") as fDst:
+                # Copy until the end of the source is reached
+                while os.copy_file_range(fSrc.fileno(), fDst.fileno(), COPY_CHUNK_SIZE) > 0:
+                    pass
+
+            return
+        except OSError as e:
+            # Check if the error is not just a lack of support
+            if e.errno not in _KERNEL_COPY_UNSUPPORTED_ERRNOS:
+                raise
+
+    # Copy through the standard library
+    shutil.copyfile(src, dst)
+
+def writeBytes(path: Union[str, os.PathLike], data: bytes):
+    """
+    Writes the `data` to the file at `path` directly through its file descriptor without any buffering.
+    Useful when the complete content is already in memory and would only be copied again by a buffered writer.
+
+    path: The path of the file to write. Will be overwritten if it exists.
+    data: The bytes to write.
+    """
+    # NOTE: `O_BINARY` keeps Windows from translating line endings and the mode is the same one `open` uses before the umask applies.
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        # Write until everything is written since a single write may be partial
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def sameContent(pathA: Union[str, os.PathLike], pathB: Union[str, os.PathLike]) -> bool:
+    """
+    Checks if the files at `pathA` and `pathB` contain the same bytes.
+    Files with different sizes are told apart without reading any content.
+
+    pathA: The path of the first file.
+    pathB: The path of the second file.
+
+    Returns `True` if the content of both files is identical.
+    """
+    with open(pathA, "rb") as fA, open(pathB, "rb") as fB:
+        # Check the sizes
+        if os.fstat(fA.fileno()).st_size != os.fstat(fB.fileno()).st_size:
+            return False
+
+        # Compare the content
+        while True:
+            chunk = fA.read(COMPARE_CHUNK_SIZE)
+            if chunk != fB.read(COMPARE_CHUNK_SIZE):
+                return False
+
+            if not chunk:
+                return True